@@ -9,19 +9,107 @@ argumentos de linha de comando para permitir o uso dentro do AkôFlow.
 from __future__ import annotations
 
 import argparse
+import asyncio
+import copy
+import hashlib
 import json
+import mimetypes
+import mmap
 import os
+import random
 import sys
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import tempfile
+import uuid
+import zipfile
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, replace
 from datetime import datetime, timezone
+from functools import lru_cache
 from pathlib import Path
-from time import sleep
-from typing import Dict, Iterable
-
-from pyDataverse.api import NativeApi
-from pyDataverse.models import Datafile, Dataset, Dataverse
+from time import time
+from typing import (
+    TYPE_CHECKING,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+)
+
+if TYPE_CHECKING:
+    # pyDataverse/httpx (e jsonschema, por tabela) são importados só quando
+    # necessários, para que `--help` e erros de argumentos respondam rápido.
+    import httpx
+    from pyDataverse.api import NativeApi
+    from pyDataverse.models import Dataset
+
+try:
+    import orjson
+except ImportError:  # orjson é opcional; sem ele usamos o json da stdlib.
+    orjson = None
+
+try:
+    import zstandard as zstd
+except ImportError:  # zstandard é opcional; sem ele os arquivos vão sem compressão.
+    zstd = None
 
 DATASET_TEMPLATE_FILENAME = "dataset.sample.json"
+STATE_FILENAME = ".akoflow_state.json"
+DEFAULT_STATE_TTL = 24 * 60 * 60
+DEFAULT_UPLOAD_CONCURRENCY = min(32, (os.cpu_count() or 4) * 4)
+DEFAULT_MULTIPART_THRESHOLD = 100 * 1024 * 1024
+DEFAULT_PART_CONCURRENCY = 4
+DEFAULT_SMALL_FILE_THRESHOLD = 1024 * 1024
+DEFAULT_BATCH_SIZE = 20
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+MAX_RETRY_DELAY = 60.0
+# Limite por operação (conectar, ler, escrever). Alto porque o Dataverse só
+# responde ao `/add` depois de processar o arquivo recebido.
+HTTP_TIMEOUT = 300.0
+# Token inválido ou sem permissão: repetir não adianta. As demais falhas são
+# repetidas, inclusive 409/400 de dataset bloqueado enquanto o Dataverse
+# processa um upload anterior (ingestão de tabelas, descompactação de lotes).
+AUTH_ERRORS = frozenset({401, 403})
+COMPRESS_MIN_SIZE = 64 * 1024
+ZSTD_LEVEL = 3
+COMPRESSIBLE_MIME_TYPES = frozenset(
+    {
+        "application/json",
+        "application/xml",
+        "application/javascript",
+        "application/x-yaml",
+        "application/yaml",
+        "application/x-sh",
+        "image/svg+xml",
+    }
+)
+# Componentes de shapefile que o Dataverse reagrupa em um zip ao descompactar
+# um lote (ShapefileHandler); enviados individualmente, são publicados como estão.
+SHAPEFILE_SUFFIXES = (
+    ".shp",
+    ".shx",
+    ".dbf",
+    ".prj",
+    ".sbn",
+    ".sbx",
+    ".fbn",
+    ".fbx",
+    ".ain",
+    ".aih",
+    ".ixs",
+    ".mxs",
+    ".atx",
+    ".cpg",
+    ".qpj",
+    ".qmd",
+    ".shp.xml",
+)
+# Extensões comuns em saídas de workflow que o `mimetypes` não reconhece.
+COMPRESSIBLE_EXTENSIONS = frozenset({".log", ".out", ".err", ".yaml", ".yml", ".ipynb"})
+_END_OF_ITEMS = object()
 
 
 def default_dataset_template_path() -> Path:
@@ -32,7 +120,7 @@ def default_dataset_template_path() -> Path:
     raise FileNotFoundError(f"Template de dataset não encontrado em {sample_path}")
 
 
-def parse_args() -> argparse.Namespace:
+def _build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(description="Publica arquivos do workflow no Dataverse.")
     parser.add_argument(
         "--base-url",
@@ -92,13 +180,73 @@ def parse_args() -> argparse.Namespace:
         "--upload-retry-delay",
         type=float,
         default=float(os.environ.get("DATAVERSE_UPLOAD_RETRY_DELAY", 2)),
-        help="Intervalo em segundos entre tentativas de upload (default: 2).",
+        help=(
+            "Intervalo base em segundos entre tentativas de upload; dobra a cada "
+            "tentativa, com jitter, até 60s (default: 2)."
+        ),
     )
     parser.add_argument(
         "--concurrent-upload",
         action="store_true",
         help="Envia arquivos em paralelo em vez de sequencialmente.",
     )
+    parser.add_argument(
+        "--upload-concurrency",
+        type=int,
+        default=int(os.environ.get("DATAVERSE_UPLOAD_CONCURRENCY", DEFAULT_UPLOAD_CONCURRENCY)),
+        help=(
+            "Número máximo de uploads simultâneos com --concurrent-upload "
+            f"(default: {DEFAULT_UPLOAD_CONCURRENCY})."
+        ),
+    )
+    parser.add_argument(
+        "--multipart-threshold",
+        type=int,
+        default=int(os.environ.get("DATAVERSE_MULTIPART_THRESHOLD", DEFAULT_MULTIPART_THRESHOLD)),
+        help=(
+            "Arquivos maiores que este tamanho (bytes) são enviados direto ao storage "
+            "do dataset em partes paralelas, quando suportado; 0 desativa (default: 100 MiB)."
+        ),
+    )
+    parser.add_argument(
+        "--part-concurrency",
+        type=int,
+        default=int(os.environ.get("DATAVERSE_PART_CONCURRENCY", DEFAULT_PART_CONCURRENCY)),
+        help=f"Partes enviadas simultaneamente por arquivo grande (default: {DEFAULT_PART_CONCURRENCY}).",
+    )
+    parser.add_argument(
+        "--small-file-threshold",
+        type=int,
+        default=int(os.environ.get("DATAVERSE_SMALL_FILE_THRESHOLD", DEFAULT_SMALL_FILE_THRESHOLD)),
+        help="Arquivos menores que este tamanho (bytes) são enviados em lotes (default: 1 MiB).",
+    )
+    parser.add_argument(
+        "--small-file-batch-size",
+        type=int,
+        default=int(os.environ.get("DATAVERSE_SMALL_FILE_BATCH_SIZE", DEFAULT_BATCH_SIZE)),
+        help=(
+            "Quantidade máxima de arquivos pequenos por requisição, empacotados em um zip "
+            f"que o Dataverse descompacta; 1 desativa (default: {DEFAULT_BATCH_SIZE})."
+        ),
+    )
+    parser.add_argument(
+        "--compress",
+        action=argparse.BooleanOptionalAction,
+        default=os.environ.get("DATAVERSE_UPLOAD_COMPRESS") == "1",
+        help=(
+            "Comprime arquivos de texto (logs, CSV, JSON...) com zstd antes do envio. "
+            "Os maiores que 64 KiB são publicados como '<nome>.zst'."
+        ),
+    )
+    parser.add_argument(
+        "--skip-duplicates",
+        action=argparse.BooleanOptionalAction,
+        default=os.environ.get("DATAVERSE_SKIP_DUPLICATES") == "1",
+        help=(
+            "Envia apenas a primeira ocorrência de arquivos com conteúdo idêntico (MD5); "
+            "as cópias seguintes não são incluídas no dataset."
+        ),
+    )
     parser.add_argument(
         "--title-suffix",
         default=os.environ.get("DATASET_TITLE_SUFFIX"),
@@ -109,6 +257,20 @@ def parse_args() -> argparse.Namespace:
         action="store_true",
         help="Não tenta criar o Dataverse filho (assume que já existe).",
     )
+    parser.add_argument(
+        "--state-file",
+        default=os.environ.get("AKOFLOW_STATE_FILE"),
+        help=(
+            "Arquivo de estado local que lembra Dataverses já verificados "
+            f"(default: {STATE_FILENAME} ao lado do --data-root)."
+        ),
+    )
+    parser.add_argument(
+        "--state-ttl",
+        type=float,
+        default=float(os.environ.get("AKOFLOW_STATE_TTL", DEFAULT_STATE_TTL)),
+        help="Validade em segundos do arquivo de estado; 0 desativa (default: 86400).",
+    )
     parser.add_argument(
         "--citation-title",
         required=True,
@@ -149,18 +311,42 @@ def parse_args() -> argparse.Namespace:
         required=True,
         help="Descrição do dataset (campo dsDescriptionValue).",
     )
-    return parser.parse_args()
+    return parser
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    # Montado a cada chamada: os defaults vêm das variáveis de ambiente atuais.
+    return _build_parser().parse_args(argv)
 
 
 def ensure_trailing_slash(url: str) -> str:
     return url if url.endswith("/") else f"{url}/"
 
 
+def json_loads(data: bytes | str):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def json_dumps(obj) -> str:
+    if orjson is not None:
+        return orjson.dumps(obj).decode("utf-8")
+    return json.dumps(obj)
+
+
+@lru_cache(maxsize=8)
+def _load_template_cached(path_str: str, mtime_ns: int) -> Dict:
+    # `mtime_ns` só entra na chave do cache: editar o template invalida a entrada.
+    return json_loads(Path(path_str).read_bytes())
+
+
 def load_dataset_template(path: Path) -> Dict:
     if not path.is_file():
         raise FileNotFoundError(f"Template de dataset não encontrado em {path}")
-    with path.open("r", encoding="utf-8") as fp:
-        return json.load(fp)
+    template = _load_template_cached(str(path), path.stat().st_mtime_ns)
+    # O chamador altera o metadata (sufixo, overrides); o cache não pode ser tocado.
+    return copy.deepcopy(template)
 
 
 def get_citation_fields(metadata: Dict) -> list[Dict]:
@@ -172,14 +358,24 @@ def get_citation_fields(metadata: Dict) -> list[Dict]:
     )
 
 
-def find_field(fields: list[Dict], type_name: str) -> Dict | None:
-    return next((field for field in fields if field.get("typeName") == type_name), None)
+def index_fields(fields: list[Dict]) -> Dict[str, Dict]:
+    index: Dict[str, Dict] = {}
+    for field in fields:
+        # Mantém a primeira ocorrência, como a busca linear fazia.
+        index.setdefault(field.get("typeName"), field)
+    return index
+
 
+def find_field(index: Dict[str, Dict], type_name: str) -> Dict | None:
+    return index.get(type_name)
 
-def set_simple_field(fields: list[Dict], type_name: str, value: str) -> None:
+
+def set_simple_field(
+    fields: list[Dict], index: Dict[str, Dict], type_name: str, value: str
+) -> None:
     if value is None:
         return
-    field = find_field(fields, type_name)
+    field = find_field(index, type_name)
     if field is None:
         field = {
             "typeName": type_name,
@@ -188,12 +384,13 @@ def set_simple_field(fields: list[Dict], type_name: str, value: str) -> None:
             "value": value,
         }
         fields.append(field)
+        index[type_name] = field
     else:
         field["value"] = value
 
 
-def ensure_compound_entry(fields: list[Dict], type_name: str) -> Dict:
-    field = find_field(fields, type_name)
+def ensure_compound_entry(fields: list[Dict], index: Dict[str, Dict], type_name: str) -> Dict:
+    field = find_field(index, type_name)
     if field is None:
         field = {
             "typeName": type_name,
@@ -202,6 +399,7 @@ def ensure_compound_entry(fields: list[Dict], type_name: str) -> Dict:
             "value": [{}],
         }
         fields.append(field)
+        index[type_name] = field
     if not field.get("value"):
         field["value"] = [{}]
     return field["value"][0]
@@ -223,24 +421,32 @@ def update_compound_entry(entry: Dict, values: Dict[str, str]) -> None:
             subfield["value"] = new_value
 
 
-def apply_title_suffix(metadata: Dict, suffix: str) -> None:
+def apply_title_suffix(
+    metadata: Dict, suffix: str, index: Dict[str, Dict] | None = None
+) -> None:
     if not suffix:
         return
     fields = get_citation_fields(metadata)
-    field = find_field(fields, "title")
+    if index is None:
+        index = index_fields(fields)
+    field = find_field(index, "title")
     if field and isinstance(field.get("value"), str):
         field["value"] = f"{field['value']} {suffix}"
     else:
-        set_simple_field(fields, "title", suffix)
+        set_simple_field(fields, index, "title", suffix)
 
 
-def apply_metadata_overrides(metadata: Dict, args: argparse.Namespace) -> None:
+def apply_metadata_overrides(
+    metadata: Dict, args: argparse.Namespace, index: Dict[str, Dict] | None = None
+) -> None:
     fields = get_citation_fields(metadata)
+    if index is None:
+        index = index_fields(fields)
 
     if args.citation_title:
-        set_simple_field(fields, "title", args.citation_title)
+        set_simple_field(fields, index, "title", args.citation_title)
 
-    author_entry = ensure_compound_entry(fields, "author")
+    author_entry = ensure_compound_entry(fields, index, "author")
     update_compound_entry(
         author_entry,
         {
@@ -251,7 +457,7 @@ def apply_metadata_overrides(metadata: Dict, args: argparse.Namespace) -> None:
         },
     )
 
-    contact_entry = ensure_compound_entry(fields, "datasetContact")
+    contact_entry = ensure_compound_entry(fields, index, "datasetContact")
     update_compound_entry(
         contact_entry,
         {
@@ -260,13 +466,60 @@ def apply_metadata_overrides(metadata: Dict, args: argparse.Namespace) -> None:
         },
     )
 
-    description_entry = ensure_compound_entry(fields, "dsDescription")
+    description_entry = ensure_compound_entry(fields, index, "dsDescription")
     update_compound_entry(
         description_entry,
         {"dsDescriptionValue": args.dataset_description},
     )
 
 
+def load_state(state_file: Path | None, ttl: float) -> Dict[str, float]:
+    """Lê o estado local de execuções anteriores: `{chave: gravado_em}`.
+
+    Cada entrada expira pela própria idade, então gravar uma chave nova não
+    renova as demais. Entradas expiradas ou inválidas são descartadas.
+    """
+    if state_file is None:
+        return {}
+    try:
+        state = json_loads(state_file.read_bytes())
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(state, dict):
+        return {}
+    now = time()
+    return {
+        key: saved_at
+        for key, saved_at in state.items()
+        if isinstance(saved_at, (int, float))
+        and not isinstance(saved_at, bool)
+        and 0 <= now - saved_at < ttl
+    }
+
+
+def save_state(state_file: Path | None, state: Dict[str, float]) -> None:
+    if state_file is None:
+        return
+    try:
+        state_file.write_text(json_dumps(state), encoding="utf-8")
+    except OSError as exc:
+        print(f"Não foi possível gravar o estado local em {state_file}: {exc}")
+
+
+def _dataverse_exists(api: NativeApi, alias: str) -> bool:
+    client = getattr(api, "http_client", None)
+    if client is None:
+        # NativeApi sem `use_http_client`: sem cliente compartilhado para o HEAD.
+        return api.get_dataverse(alias).status_code == 200
+    # HEAD evita baixar e decodificar o corpo do Dataverse só para saber se existe.
+    response = client.head(
+        f"{api.base_url_api_native}/dataverses/{alias}", auth=api.auth
+    )
+    if response.status_code in {200, 404}:
+        return response.status_code == 200
+    return api.get_dataverse(alias).status_code == 200
+
+
 def ensure_dataverse_exists(
     api: NativeApi,
     parent_alias: str,
@@ -276,16 +529,26 @@ def ensure_dataverse_exists(
     affiliation: str,
     description: str,
     skip_creation: bool,
+    state_file: Path | None = None,
+    state_ttl: float = 0,
 ) -> None:
+    state = load_state(state_file, state_ttl)
+    state_key = f"{api.base_url_api_native}/dataverses/{alias}"
+    if state_key in state:
+        print(f"Dataverse '{alias}' já verificado em execução recente, reutilizando.")
+        return
+
     if skip_creation:
         print(f"Pulando criação do Dataverse '{alias}'.")
         return
 
-    existing = api.get_dataverse(alias)
-    if existing.status_code == 200:
+    if _dataverse_exists(api, alias):
         print(f"Dataverse '{alias}' já existe, reutilizando.")
+        save_state(state_file, {**state, state_key: time()})
         return
 
+    from pyDataverse.models import Dataverse
+
     dataverse = Dataverse()
     dataverse.set(
         {
@@ -301,10 +564,12 @@ def ensure_dataverse_exists(
     response = api.create_dataverse(parent_alias, dataverse.json())
     if response.status_code == 201:
         print(f"Dataverse '{alias}' criado com sucesso sob '{parent_alias}'.")
+        save_state(state_file, {**state, state_key: time()})
         return
 
     if response.status_code == 400 and "already exists" in response.text.lower():
         print(f"Dataverse '{alias}' já existia (resposta 400), prosseguindo.")
+        save_state(state_file, {**state, state_key: time()})
         return
 
     raise RuntimeError(
@@ -312,6 +577,21 @@ def ensure_dataverse_exists(
     )
 
 
+# Argumentos que alteram a estrutura do metadata (quais campos existem), e não
+# só os valores; junto com o template, determinam o resultado da validação.
+OVERRIDE_ARGS = (
+    "citation_title",
+    "author_name",
+    "author_affiliation",
+    "author_identifier",
+    "author_identifier_scheme",
+    "contact_name",
+    "contact_email",
+    "dataset_description",
+)
+_VALIDATED: set[tuple] = set()
+
+
 def build_dataset(dataset_json_path: Path, args: argparse.Namespace) -> Dataset:
     metadata = load_dataset_template(dataset_json_path)
 
@@ -320,25 +600,105 @@ def build_dataset(dataset_json_path: Path, args: argparse.Namespace) -> Dataset:
     else:
         suffix = args.title_suffix
 
-    apply_title_suffix(metadata, suffix)
-    apply_metadata_overrides(metadata, args)
+    index = index_fields(get_citation_fields(metadata))
+    apply_title_suffix(metadata, suffix, index)
+    apply_metadata_overrides(metadata, args, index)
+
+    from pyDataverse.models import Dataset
 
+    # `from_json` e `json()` validariam contra o mesmo schema; a validação
+    # explícita abaixo basta, e só roda uma vez por template/conjunto de campos.
     dataset = Dataset()
-    dataset.from_json(json.dumps(metadata))
-    dataset.validate_json()
+    dataset.from_json(json_dumps(metadata), validate=False)
+    validation_key = (
+        str(dataset_json_path),
+        dataset_json_path.stat().st_mtime_ns,
+        bool(suffix),
+        tuple(name for name in OVERRIDE_ARGS if getattr(args, name) is not None),
+    )
+    if validation_key not in _VALIDATED:
+        dataset.validate_json()
+        _VALIDATED.add(validation_key)
     return dataset
 
 
-def iter_files(root: Path) -> Iterable[Path]:
+def _walk_files(root: str) -> Iterator[str]:
+    stack = [root]
+    while stack:
+        try:
+            entries = os.scandir(stack.pop())
+        except PermissionError:
+            # Como o rglob, diretórios sem permissão de leitura são ignorados.
+            continue
+        with entries:
+            for entry in entries:
+                # Assim como o rglob, não desce em diretórios que são symlinks,
+                # mas envia arquivos apontados por symlink.
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file():
+                    yield entry.path
+
+
+def iter_files(root: Path) -> Iterator[str]:
     if not root.exists():
         raise FileNotFoundError(f"Diretório de dados não encontrado: {root}")
-    for file_path in root.rglob("*"):
-        if file_path.is_file():
-            yield file_path
+    if not root.is_dir():
+        # Mesmo resultado do rglob sobre um arquivo comum: nada a enviar.
+        return iter(())
+    return _walk_files(str(root))
+
+
+def create_http_client(
+    max_connections: int, connect_retries: int = 0, asynchronous: bool = False
+) -> httpx.Client | httpx.AsyncClient:
+    """Cria o cliente HTTP (keep-alive) compartilhado pelas chamadas à API.
+
+    Com `asynchronous=True` devolve um `httpx.AsyncClient`, usado nos uploads.
+    """
+    import httpx
+
+    limits = httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_connections,
+    )
+    # Todas as conexões do pool ficam em keep-alive; sem limite de espera pelo
+    # pool, uma requisição além do limite aguarda uma conexão livre em vez de
+    # falhar. As demais operações têm limite, para uma conexão travada não
+    # prender a execução para sempre.
+    if asynchronous:
+        transport_class, client_class = httpx.AsyncHTTPTransport, httpx.AsyncClient
+    else:
+        transport_class, client_class = httpx.HTTPTransport, httpx.Client
+    return client_class(
+        transport=transport_class(limits=limits, retries=connect_retries),
+        headers={"Connection": "keep-alive"},
+        timeout=httpx.Timeout(HTTP_TIMEOUT, pool=None),
+        # O pyDataverse segue redirecionamentos; os uploads diretos fazem o mesmo.
+        follow_redirects=True,
+    )
+
+
+def use_http_client(api: NativeApi, client: httpx.Client) -> None:
+    """Faz o NativeApi reutilizar `client` em vez de abrir uma conexão por requisição.
+
+    O pyDataverse chama as funções de módulo `httpx.get`/`httpx.post`/... quando não
+    há cliente assíncrono configurado; aqui elas são trocadas pelos métodos de
+    mesmo nome do cliente compartilhado.
+    """
+    sync_request = api._sync_request
+
+    def pooled_request(method, **kwargs):
+        return sync_request(method=getattr(client, method.__name__), **kwargs)
+
+    api._sync_request = pooled_request
+    # Usado diretamente em chamadas que o pyDataverse não expõe (ex.: HEAD).
+    api.http_client = client
 
 
 def create_dataset(api: NativeApi, dataverse_alias: str, dataset: Dataset) -> str:
-    response = api.create_dataset(dataverse_alias, dataset.json())
+    # O dataset vem de `build_dataset`, que já o validou contra o schema.
+    response = api.create_dataset(dataverse_alias, dataset.json(validate=False))
     if response.status_code != 201:
         raise RuntimeError(
             f"Falha ao criar dataset (status {response.status_code}): {response.text}"
@@ -349,74 +709,661 @@ def create_dataset(api: NativeApi, dataverse_alias: str, dataset: Dataset) -> st
     return dataset_pid
 
 
-def _upload_single_file(
-    api: NativeApi,
-    dataset_pid: str,
-    file_path: Path,
+@dataclass(frozen=True)
+class UploadOptions:
+    retries: int = 3
+    retry_delay: float = 2.0
+    multipart_threshold: int = DEFAULT_MULTIPART_THRESHOLD
+    part_concurrency: int = DEFAULT_PART_CONCURRENCY
+    small_file_threshold: int = DEFAULT_SMALL_FILE_THRESHOLD
+    batch_size: int = DEFAULT_BATCH_SIZE
+    compress: bool = False
+    skip_duplicates: bool = False
+
+
+def connection_pool_size(max_workers: int, options: UploadOptions) -> int:
+    """Conexões necessárias para que nenhum upload em andamento espere por outra."""
+    if options.multipart_threshold:
+        # Cada upload direto envia até `part_concurrency` partes simultâneas.
+        return max_workers * options.part_concurrency
+    return max_workers
+
+
+def _retry_backoff(
+    attempt: int, retry_delay: float, response: httpx.Response | None = None
+) -> float:
+    """Espera antes da próxima tentativa: backoff exponencial com jitter.
+
+    O jitter evita que vários uploads repitam em sincronia após uma falha
+    coletiva (ex.: 503). Um `Retry-After` em segundos enviado pelo servidor
+    tem precedência.
+    """
+    retry_after = response.headers.get("Retry-After", "") if response is not None else ""
+    try:
+        return min(MAX_RETRY_DELAY, max(0.0, float(retry_after)))
+    except ValueError:
+        pass
+    backoff = min(MAX_RETRY_DELAY, retry_delay * 2 ** (attempt - 1))
+    return backoff + random.uniform(0, retry_delay)
+
+
+async def _send_with_retries(
+    send: Callable[[int], Awaitable[httpx.Response]],
+    target: str,
     retries: int,
     retry_delay: float,
-) -> None:
+) -> httpx.Response:
+    import httpx
+
     attempts = 0
     while True:
         attempts += 1
-        print(f"Enviando arquivo (tentativa {attempts}/{retries}): {file_path}")
-        datafile = Datafile()
-        datafile.set({"pid": dataset_pid, "filename": file_path.name})
-        response = api.upload_datafile(dataset_pid, str(file_path), datafile.json())
+        try:
+            response = await send(attempts)
+        except httpx.TransportError as exc:
+            # Conexão perdida no meio do corpo (o `retries` do transporte só cobre
+            # o estabelecimento da conexão): repete com o mesmo backoff de um 5xx.
+            if attempts >= retries:
+                raise RuntimeError(
+                    f"Falha ao enviar '{target}' após {attempts} tentativas: {exc!r}"
+                ) from exc
+            await asyncio.sleep(_retry_backoff(attempts, retry_delay))
+            continue
 
         if response.status_code in {200, 201}:
-            print(f"Upload concluído: {file_path}")
-            return
+            return response
 
         try:
             detail = response.json()
         except ValueError:
             detail = response.text
 
+        if response.status_code in AUTH_ERRORS:
+            raise RuntimeError(
+                f"Falha ao enviar '{target}' (status {response.status_code}): {detail}"
+            )
+
         if attempts >= retries:
             raise RuntimeError(
-                f"Falha ao enviar '{file_path}' após {attempts} tentativas (status {response.status_code}): {detail}"
+                f"Falha ao enviar '{target}' após {attempts} tentativas (status {response.status_code}): {detail}"
             )
 
-        sleep(retry_delay)
+        await asyncio.sleep(_retry_backoff(attempts, retry_delay, response))
+
+
+async def _aiter_file_range(file_path: str, offset: int, length: int) -> AsyncIterator[bytes]:
+    # As leituras rodam em threads auxiliares: um disco lento (ex.: NFS) não
+    # trava os demais uploads do event loop.
+    with open(file_path, "rb") as fp:
+        fp.seek(offset)
+        remaining = length
+        while remaining > 0:
+            chunk = await asyncio.to_thread(fp.read, min(UPLOAD_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+@dataclass(frozen=True)
+class _Uploader:
+    """Cliente assíncrono e destino (API e dataset) compartilhados pelos uploads."""
+
+    client: httpx.AsyncClient
+    api: NativeApi
+    dataset_pid: str
+    options: UploadOptions
+    # MD5 já calculados por `_skip_duplicates`, por caminho, para o upload direto.
+    checksums: Dict[str, str]
+
+
+async def _put_to_storage(
+    uploader: _Uploader,
+    url: str,
+    file_path: str,
+    offset: int,
+    length: int,
+    headers: Dict[str, str] | None = None,
+    label: str | None = None,
+) -> httpx.Response:
+    # URLs pré-assinadas do storage: o token do Dataverse não deve ser enviado.
+    # S3 não aceita corpo chunked, por isso o Content-Length é explícito.
+    request_headers = {"Content-Length": str(length), **(headers or {})}
+    return await _send_with_retries(
+        lambda _attempt: uploader.client.put(
+            url,
+            content=_aiter_file_range(file_path, offset, length),
+            headers=request_headers,
+        ),
+        f"{label or file_path} [{offset}:{offset + length}]",
+        uploader.options.retries,
+        uploader.options.retry_delay,
+    )
 
 
-def upload_files(
-    api: NativeApi,
-    dataset_pid: str,
-    files: Iterable[Path],
-    concurrent: bool = False,
-    retries: int = 3,
-    retry_delay: float = 2.0,
+async def _put_multipart(
+    uploader: _Uploader, upload: Dict, file_path: str, size: int, label: str
 ) -> None:
-    if not concurrent:
-        for file_path in files:
-            _upload_single_file(api, dataset_pid, file_path, retries, retry_delay)
-        return
+    api, options = uploader.api, uploader.options
+    part_size = int(upload["partSize"])
+    parts = asyncio.Semaphore(options.part_concurrency)
+
+    async def put_part(part: str, url: str) -> tuple[str, str]:
+        offset = (int(part) - 1) * part_size
+        async with parts:
+            response = await _put_to_storage(
+                uploader,
+                url,
+                file_path,
+                offset,
+                min(part_size, size - offset),
+                label=label,
+            )
+        return part, response.headers["ETag"]
+
+    tasks = [asyncio.ensure_future(put_part(*item)) for item in upload["urls"].items()]
+    try:
+        etags = dict(await asyncio.gather(*tasks))
+        await _send_with_retries(
+            lambda _attempt: uploader.client.put(
+                f"{api.base_url}{upload['complete']}", json=etags, auth=api.auth
+            ),
+            label,
+            options.retries,
+            options.retry_delay,
+        )
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await uploader.client.delete(f"{api.base_url}{upload['abort']}", auth=api.auth)
+        raise
+
+
+def _datafile_json(dataset_pid: str, file_name: str) -> str:
+    # Mesmo JSON que `Datafile().set(...).json()` produz, sem reler e validar o
+    # schema do pyDataverse a cada arquivo: `pid` e `filename` são sempre strings.
+    return json_dumps({"pid": dataset_pid, "filename": file_name})
+
+
+# Escape de nomes em `Content-Disposition` definido pelo HTML5 (o mesmo do httpx).
+_FORM_PARAM_ESCAPES = str.maketrans(
+    {'"': "%22", "\\": "\\\\", **{chr(c): f"%{c:02X}" for c in range(0x20) if c != 0x1B}}
+)
+
+
+def _multipart_body(
+    json_data: str, file_name: str, file_path: str
+) -> tuple[Dict[str, str], AsyncIterator[bytes]]:
+    """Monta o corpo multipart de `/add` lendo o arquivo em streaming.
+
+    O httpx leria o arquivo de forma bloqueante dentro do event loop; aqui o
+    conteúdo vem de `_aiter_file_range` e o Content-Length é calculado antes.
+    """
+    boundary = uuid.uuid4().hex
+    mime_type = mimetypes.guess_type(file_name)[0] or "application/octet-stream"
+    head = (
+        f"--{boundary}\r\n"
+        'Content-Disposition: form-data; name="jsonData"\r\n\r\n'
+        f"{json_data}\r\n"
+        f"--{boundary}\r\n"
+        'Content-Disposition: form-data; name="file"; '
+        f'filename="{file_name.translate(_FORM_PARAM_ESCAPES)}"\r\n'
+        f"Content-Type: {mime_type}\r\n\r\n"
+    ).encode()
+    tail = f"\r\n--{boundary}--\r\n".encode()
+    size = os.path.getsize(file_path)
+
+    async def body() -> AsyncIterator[bytes]:
+        yield head
+        async for chunk in _aiter_file_range(file_path, 0, size):
+            yield chunk
+        yield tail
+
+    headers = {
+        "Content-Type": f"multipart/form-data; boundary={boundary}",
+        "Content-Length": str(len(head) + size + len(tail)),
+    }
+    return headers, body()
+
+
+async def _post_datafile(
+    uploader: _Uploader,
+    json_data: str,
+    upload: tuple[str, str] | None = None,
+) -> httpx.Response:
+    """Adiciona um arquivo ao dataset via `/add` usando o cliente compartilhado.
+
+    `upload` é o par (nome, caminho) do arquivo enviado em streaming no corpo
+    multipart. Sem ele, apenas o `jsonData` é enviado (registro de arquivo já
+    enviado ao storage).
+    """
+    api = uploader.api
+    url = f"{api.base_url_api_native}/datasets/:persistentId/add"
+    params = {"persistentId": uploader.dataset_pid}
+    if upload is None:
+        return await uploader.client.post(
+            url, params=params, files={"jsonData": (None, json_data)}, auth=api.auth
+        )
+
+    headers, body = _multipart_body(json_data, *upload)
+    return await uploader.client.post(
+        url, params=params, content=body, headers=headers, auth=api.auth
+    )
+
+
+def _new_md5():
+    # MD5 é usado só como checksum de integridade, não para segurança.
+    return hashlib.md5(usedforsecurity=False)
+
+
+def _md5_file(file_path: str) -> str:
+    with open(file_path, "rb") as fp:
+        if hasattr(hashlib, "file_digest"):
+            # Python 3.11+: laço em Python de `readinto`/`update` em blocos de 256 KiB,
+            # sem buffers intermediários; o `update` libera o GIL, como no mmap abaixo.
+            # Não é mais rápido que o mmap, só evita mapear o arquivo inteiro.
+            return hashlib.file_digest(fp, _new_md5).hexdigest()
+
+        digest = _new_md5()
+        if os.fstat(fp.fileno()).st_size:
+            # O hashlib libera o GIL em blocos grandes, então vários hashes rodam em paralelo.
+            with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                digest.update(mapped)
+        return digest.hexdigest()
+
+
+@lru_cache(maxsize=None)
+def _hash_pool() -> ThreadPoolExecutor:
+    """Pool compartilhado para checksums, limitado ao número de CPUs."""
+    return ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix="md5")
 
-    file_list = list(files)
-    errors = []
 
-    with ThreadPoolExecutor() as executor:
-        future_to_file = {
-            executor.submit(
-                _upload_single_file, api, dataset_pid, file_path, retries, retry_delay
-            ): file_path
-            for file_path in file_list
+@lru_cache(maxsize=None)
+def _packing_pool() -> ThreadPoolExecutor:
+    """Pool para compressão zstd e montagem de zips, limitado ao número de CPUs.
+
+    Fica separado do executor padrão do asyncio, onde rodam as leituras em
+    streaming dos uploads, para que compressões longas não as travem.
+    """
+    return ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix="pack")
+
+
+async def _direct_upload(
+    uploader: _Uploader, file_path: str, size: int, label: str
+) -> bool:
+    """Envia o arquivo direto ao storage do dataset (S3), em partes paralelas.
+
+    Retorna False quando o storage do dataset não suporta upload direto; nesse
+    caso o chamador deve usar o upload padrão via API. `label` é o caminho
+    exibido nos logs (o arquivo original quando `file_path` é uma cópia `.zst`).
+    """
+    api, options = uploader.api, uploader.options
+    response = await uploader.client.get(
+        f"{api.base_url_api_native}/datasets/:persistentId/uploadurls",
+        params={"persistentId": uploader.dataset_pid, "size": size},
+        auth=api.auth,
+    )
+    if response.status_code != 200:
+        print(
+            f"Upload direto indisponível (status {response.status_code}), "
+            f"usando upload padrão: {label}"
+        )
+        return False
+
+    upload = response.json()["data"]
+    print(f"Enviando arquivo direto ao storage: {label}")
+    # O checksum exigido no registro vem do `--skip-duplicates`, se já calculado;
+    # senão, é calculado enquanto as partes são enviadas.
+    digest = uploader.checksums.pop(file_path, None)
+    checksum = (
+        asyncio.wrap_future(_hash_pool().submit(_md5_file, file_path))
+        if digest is None
+        else None
+    )
+    try:
+        if "url" in upload:
+            await _put_to_storage(
+                uploader,
+                upload["url"],
+                file_path,
+                0,
+                size,
+                headers={"x-amz-tagging": "dv-state=temp"},
+                label=label,
+            )
+        else:
+            await _put_multipart(uploader, upload, file_path, size, label)
+    except BaseException:
+        if checksum is not None:
+            checksum.cancel()
+        raise
+
+    file_name = os.path.basename(file_path)
+    json_data = json_dumps(
+        {
+            "storageIdentifier": upload["storageIdentifier"],
+            "fileName": file_name,
+            "mimeType": mimetypes.guess_type(file_name)[0] or "application/octet-stream",
+            "checksum": {"@type": "MD5", "@value": digest or await checksum},
         }
+    )
+    await _send_with_retries(
+        lambda _attempt: _post_datafile(uploader, json_data),
+        label,
+        options.retries,
+        options.retry_delay,
+    )
+    return True
+
+
+def _is_compressible(file_name: str) -> bool:
+    if os.path.splitext(file_name)[1].lower() in COMPRESSIBLE_EXTENSIONS:
+        return True
+    mime_type = mimetypes.guess_type(file_name)[0] or ""
+    return mime_type.startswith("text/") or mime_type in COMPRESSIBLE_MIME_TYPES
+
+
+def _uses_zstd(file_path: str, size: int, options: UploadOptions) -> bool:
+    """Indica se o arquivo é publicado como '<nome>.zst'; depende só do próprio arquivo."""
+    return (
+        options.compress
+        and zstd is not None
+        and size >= COMPRESS_MIN_SIZE
+        and _is_compressible(file_path)
+    )
+
+
+def _zstd_compress(src_path: str, dst_path: str) -> None:
+    # Um thread por arquivo: vários uploads comprimem ao mesmo tempo.
+    compressor = zstd.ZstdCompressor(level=ZSTD_LEVEL, threads=0)
+    with open(src_path, "rb") as src, open(dst_path, "wb") as dst:
+        compressor.copy_stream(src, dst)
+
+
+@asynccontextmanager
+async def _compressed_for_upload(file_path: str, options: UploadOptions) -> AsyncIterator[str]:
+    """Fornece o caminho a enviar: o próprio arquivo ou uma cópia `.zst` temporária."""
+    if not _uses_zstd(file_path, os.path.getsize(file_path), options):
+        yield file_path
+        return
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        compressed_path = os.path.join(tmp_dir, f"{os.path.basename(file_path)}.zst")
+        await asyncio.get_running_loop().run_in_executor(
+            _packing_pool(), _zstd_compress, file_path, compressed_path
+        )
+        print(f"Arquivo comprimido com zstd para envio: {file_path}")
+        yield compressed_path
+
+
+async def _send_file(uploader: _Uploader, file_path: str, label: str) -> None:
+    options = uploader.options
+    size = os.path.getsize(file_path)
+    if 0 < options.multipart_threshold < size and await _direct_upload(
+        uploader, file_path, size, label
+    ):
+        return
+
+    file_name = os.path.basename(file_path)
+    json_data = _datafile_json(uploader.dataset_pid, file_name)
+
+    def send(attempt: int) -> Awaitable[httpx.Response]:
+        print(f"Enviando arquivo (tentativa {attempt}/{options.retries}): {label}")
+        return _post_datafile(uploader, json_data, (file_name, file_path))
+
+    await _send_with_retries(send, label, options.retries, options.retry_delay)
+
+
+async def _upload_single_file(uploader: _Uploader, file_path: str) -> None:
+    async with _compressed_for_upload(file_path, uploader.options) as upload_path:
+        # Os logs mostram o arquivo do workflow, não a cópia `.zst` temporária.
+        await _send_file(uploader, upload_path, file_path)
+    print(f"Upload concluído: {file_path}")
+
+
+def _skip_duplicates(
+    files: Iterable[str], checksums: Dict[str, str] | None = None, min_size: int = 0
+) -> Iterator[str]:
+    """Descarta arquivos cujo conteúdo (MD5) já apareceu nesta execução.
+
+    Os hashes são calculados no pool compartilhado, com alguns arquivos de
+    antecedência, e a ordem de descoberta é preservada: o primeiro caminho com
+    um dado conteúdo é enviado e os seguintes são ignorados. Com `checksums`,
+    o MD5 dos arquivos mantidos maiores que `min_size` é guardado por caminho
+    para o upload direto não recalculá-lo.
+    """
+    seen: Dict[str, str] = {}
+    window: deque[tuple[str, Future]] = deque()
+    lookahead = 2 * (os.cpu_count() or 1)
+
+    def first_occurrence() -> str | None:
+        file_path, digest = window.popleft()
+        original = seen.setdefault(digest.result(), file_path)
+        if original != file_path:
+            print(f"Ignorando '{file_path}': conteúdo idêntico a '{original}'.")
+            return None
+        if checksums is not None and os.path.getsize(file_path) > min_size:
+            checksums[file_path] = digest.result()
+        return file_path
+
+    for file_path in files:
+        window.append((file_path, _hash_pool().submit(_md5_file, file_path)))
+        if len(window) >= lookahead and (unique := first_occurrence()) is not None:
+            yield unique
+    while window:
+        if (unique := first_occurrence()) is not None:
+            yield unique
+
+
+def _batchable(file_path: str, size: int, options: UploadOptions) -> bool:
+    name = os.path.basename(file_path)
+    # O Dataverse descompacta só o primeiro nível do zip e ignora entradas ocultas,
+    # então .zip, arquivos ocultos e vazios seguem pelo upload individual, assim
+    # como partes de shapefile, que ele reempacotaria em um zip. Os que vão como
+    # '.zst' também, para que o nome publicado não dependa do lote.
+    lower_name = name.lower()
+    return (
+        options.batch_size > 1
+        and 0 < size < options.small_file_threshold
+        and not name.startswith(".")
+        and not lower_name.endswith(".zip")
+        and not lower_name.endswith(SHAPEFILE_SUFFIXES)
+        and not _uses_zstd(file_path, size, options)
+    )
+
 
-        for future in as_completed(future_to_file):
-            file_path = future_to_file[future]
+def _group_small_files(
+    files: Iterable[str], options: UploadOptions
+) -> Iterator[str | list[str]]:
+    """Agrupa arquivos pequenos em lotes de até `batch_size`; os demais passam direto."""
+    batch: list[str] = []
+    names: set[str] = set()
+    for file_path in files:
+        if not _batchable(file_path, os.path.getsize(file_path), options):
+            yield file_path
+            continue
+
+        name = os.path.basename(file_path)
+        if name in names:
+            # Nomes repetidos colidiriam dentro do zip: fecha o lote atual.
+            yield batch if len(batch) > 1 else batch[0]
+            batch, names = [], set()
+        batch.append(file_path)
+        names.add(name)
+        if len(batch) >= options.batch_size:
+            yield batch
+            batch, names = [], set()
+
+    if len(batch) == 1:
+        yield batch[0]
+    elif batch:
+        yield batch
+
+
+def _write_bundle(bundle_path: str, file_paths: list[str], options: UploadOptions) -> None:
+    with zipfile.ZipFile(bundle_path, "w", compression=zipfile.ZIP_STORED) as archive:
+        for file_path in file_paths:
+            # O zip é descompactado na ingestão: comprimir aqui reduz só o tráfego.
+            compress_type = (
+                zipfile.ZIP_DEFLATED
+                if options.compress and _is_compressible(file_path)
+                else zipfile.ZIP_STORED
+            )
+            archive.write(
+                file_path,
+                arcname=os.path.basename(file_path),
+                compress_type=compress_type,
+            )
+
+
+async def _upload_batch(uploader: _Uploader, file_paths: list[str]) -> None:
+    """Envia vários arquivos pequenos em uma única requisição.
+
+    Os arquivos são empacotados em um zip que o Dataverse descompacta na
+    ingestão, criando um arquivo do dataset para cada entrada.
+    """
+    options = uploader.options
+    label = f"lote de {len(file_paths)} arquivos ({file_paths[0]}, ...)"
+    bundle_name = f"akoflow-batch-{uuid.uuid4().hex}.zip"
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        bundle_path = os.path.join(tmp_dir, bundle_name)
+        await asyncio.get_running_loop().run_in_executor(
+            _packing_pool(), _write_bundle, bundle_path, file_paths, options
+        )
+        json_data = _datafile_json(uploader.dataset_pid, bundle_name)
+
+        def send(attempt: int) -> Awaitable[httpx.Response]:
+            print(f"Enviando {label} (tentativa {attempt}/{options.retries})")
+            return _post_datafile(uploader, json_data, (bundle_name, bundle_path))
+
+        await _send_with_retries(send, label, options.retries, options.retry_delay)
+    print(f"Upload concluído: {label}")
+
+
+async def _upload_item(uploader: _Uploader, item: str | list[str]) -> None:
+    if isinstance(item, list):
+        await _upload_batch(uploader, item)
+    else:
+        await _upload_single_file(uploader, item)
+
+
+async def _aiter_items(items: Iterator[str | list[str]]) -> AsyncIterator[str | list[str]]:
+    # A descoberta (scandir, agrupamento e hashes) é bloqueante e roda em uma
+    # thread própria, um item por vez, enquanto os uploads seguem no event loop.
+    loop = asyncio.get_running_loop()
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="discovery") as discovery:
+        while (
+            item := await loop.run_in_executor(discovery, next, items, _END_OF_ITEMS)
+        ) is not _END_OF_ITEMS:
+            yield item
+
+
+async def upload_files_async(
+    api: NativeApi,
+    dataset_pid: str,
+    files: Iterable[str],
+    concurrent: bool = False,
+    max_workers: int = DEFAULT_UPLOAD_CONCURRENCY,
+    options: UploadOptions | None = None,
+) -> int:
+    """Envia os arquivos à medida que são produzidos pelo iterável e retorna quantos foram.
+
+    Os uploads rodam como tarefas de um único event loop; `max_workers` limita
+    quantos ficam em andamento ao mesmo tempo.
+    """
+    options = options or UploadOptions()
+    checksums: Dict[str, str] = {}
+    if options.skip_duplicates:
+        files = _skip_duplicates(
+            files,
+            # Só arquivos acima do limite vão pelo upload direto, que usa o MD5.
+            checksums if options.multipart_threshold else None,
+            options.multipart_threshold,
+        )
+    items = _group_small_files(files, options)
+    if not concurrent:
+        max_workers = 1
+    count = 0
+
+    async with create_http_client(
+        connection_pool_size(max_workers, options),
+        connect_retries=options.retries,
+        asynchronous=True,
+    ) as client:
+        uploader = _Uploader(client, api, dataset_pid, options, checksums)
+        if not concurrent:
+            async for item in _aiter_items(items):
+                await _upload_item(uploader, item)
+                count += len(item) if isinstance(item, list) else 1
+            return count
+
+        errors: list[tuple[str, Exception]] = []
+        # Com todos os slots ocupados, a descoberta para no próximo item: no
+        # máximo um caminho fica pendente em memória além dos uploads em andamento.
+        slots = asyncio.Semaphore(max_workers)
+        tasks: set[asyncio.Task] = set()
+
+        async def upload(item: str | list[str]) -> None:
             try:
-                future.result()
+                await _upload_item(uploader, item)
             except Exception as exc:  # noqa: BLE001
-                errors.append((file_path, exc))
+                errors.append((item[0] if isinstance(item, list) else item, exc))
+            finally:
+                slots.release()
+
+        try:
+            async for item in _aiter_items(items):
+                await slots.acquire()
+                task = asyncio.create_task(upload(item))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+                count += len(item) if isinstance(item, list) else 1
+        finally:
+            # Erros de descoberta só sobem depois que os uploads em andamento terminam.
+            await asyncio.gather(*tasks)
 
     if errors:
         file_path, exc = errors[0]
         raise RuntimeError(
             f"Falha ao enviar arquivos (exemplo: '{file_path}'): {exc}"
         ) from exc
+    return count
+
+
+def upload_files(
+    api: NativeApi,
+    dataset_pid: str,
+    files: Iterable[str],
+    concurrent: bool = False,
+    retries: int | None = None,
+    retry_delay: float | None = None,
+    max_workers: int = DEFAULT_UPLOAD_CONCURRENCY,
+    options: UploadOptions | None = None,
+) -> int:
+    """Versão síncrona de `upload_files_async`.
+
+    `retries` e `retry_delay` são mantidos por compatibilidade com chamadores
+    antigos; quando informados, têm precedência sobre os valores de `options`.
+    """
+    options = options or UploadOptions()
+    overrides = {
+        name: value
+        for name, value in (("retries", retries), ("retry_delay", retry_delay))
+        if value is not None
+    }
+    if overrides:
+        options = replace(options, **overrides)
+    return asyncio.run(
+        upload_files_async(
+            api,
+            dataset_pid,
+            files,
+            concurrent=concurrent,
+            max_workers=max_workers,
+            options=options,
+        )
+    )
 
 
 def main() -> int:
@@ -428,36 +1375,65 @@ def main() -> int:
         )
 
     base_url = ensure_trailing_slash(args.base_url)
-    api = NativeApi(base_url, args.api_token)
+    upload_concurrency = max(1, args.upload_concurrency)
+    upload_retries = max(1, args.upload_retries)
 
     data_root = Path(args.data_root)
-    files = list(iter_files(data_root))
+    files = iter_files(data_root)
+    state_file = None
+    if args.state_ttl > 0:
+        # Fica fora do --data-root para não ser enviado junto com os arquivos do workflow.
+        state_file = (
+            Path(args.state_file)
+            if args.state_file
+            else data_root.resolve().parent / STATE_FILENAME
+        )
 
     template_path = default_dataset_template_path()
     dataset = build_dataset(template_path, args)
 
-    ensure_dataverse_exists(
-        api,
-        parent_alias=args.parent_dataverse,
-        alias=args.dataverse_alias,
-        name=args.dataverse_name,
-        contact_email=args.dataverse_email,
-        affiliation=args.dataverse_affiliation,
-        description=args.dataverse_description,
-        skip_creation=args.skip_dataverse_creation,
-    )
-    dataset_pid = create_dataset(api, args.dataverse_alias, dataset)
-    if not files:
-        print("Nenhum arquivo encontrado para upload, dataset criado sem dados.")
-    else:
-        upload_files(
+    upload_options = UploadOptions(
+        retries=upload_retries,
+        retry_delay=max(0, args.upload_retry_delay),
+        multipart_threshold=max(0, args.multipart_threshold),
+        part_concurrency=max(1, args.part_concurrency),
+        small_file_threshold=max(0, args.small_file_threshold),
+        batch_size=max(1, args.small_file_batch_size),
+        compress=args.compress,
+        skip_duplicates=args.skip_duplicates,
+    )
+
+    from pyDataverse.api import NativeApi
+
+    # As chamadas do pyDataverse são sequenciais: uma conexão basta. Os uploads
+    # usam um cliente assíncrono próprio, dimensionado em `upload_files_async`.
+    with create_http_client(1, connect_retries=upload_retries) as client:
+        api = NativeApi(base_url, args.api_token)
+        use_http_client(api, client)
+
+        ensure_dataverse_exists(
+            api,
+            parent_alias=args.parent_dataverse,
+            alias=args.dataverse_alias,
+            name=args.dataverse_name,
+            contact_email=args.dataverse_email,
+            affiliation=args.dataverse_affiliation,
+            description=args.dataverse_description,
+            skip_creation=args.skip_dataverse_creation,
+            state_file=state_file,
+            state_ttl=args.state_ttl,
+        )
+        dataset_pid = create_dataset(api, args.dataverse_alias, dataset)
+        uploaded = upload_files(
             api,
             dataset_pid,
             files,
             concurrent=args.concurrent_upload,
-            retries=max(1, args.upload_retries),
-            retry_delay=max(0, args.upload_retry_delay),
+            max_workers=upload_concurrency,
+            options=upload_options,
         )
+        if not uploaded:
+            print("Nenhum arquivo encontrado para upload, dataset criado sem dados.")
 
     print("Publicação concluída com sucesso.")
     return 0